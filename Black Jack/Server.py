@@ -1,38 +1,245 @@
 import socket
 import threading
-import random
 import time
 import json
+import os
+import hmac
+import math
+from collections import deque
+from contextlib import contextmanager
+
+from protocol import json_send, json_recv_lines
+import engine
+from profiler import SamplingProfiler
+from engine import MAX_BET, START_BALANCE
 
 # --- Konfiguration -----------------------------------------------------------
-MAX_BET = 100_000      # hartes Einsatz-Limit
-START_BALANCE = 100    # Startguthaben pro Spieler
 MAX_CHAT_LEN = 500     # Zeichenlimit pro Chatnachricht
 
+# --- Admission Control / Rate Limits -------------------------------------------
+MAX_CONNECTIONS = 64   # gleichzeitige Verbindungen, darüber wird abgelehnt
+HANDSHAKE_TIMEOUT = 10.0   # Sekunden bis zum Nickname, sonst wird der Platz wieder frei
+CLIENT_RATE = (20.0, 40)   # (Tokens/Sekunde, Burst) über alle Nachrichten eines Clients
+RATE_LIMITS = {            # Nachrichtentyp -> (Tokens/Sekunde, Burst)
+    'chat': (1.0, 5),
+    'bet': (2.0, 5),
+    'hit': (5.0, 10),
+    'stand': (5.0, 10),
+    'join': (0.5, 3),
+    'new_round': (1.0, 3),
+    'stats': (1.0, 3),
+    'spectate': (0.5, 3),
+    'admin': (0.5, 3),
+}
+SHED_CHAT_INFLIGHT = 16    # ab so vielen parallel laufenden process()-Aufrufen wird Chat verworfen
+THROTTLE_NOTICE_INTERVAL = 5.0  # höchstens ein Drossel-Hinweis pro Client in diesem Zeitraum
+
+# --- Replikation ---------------------------------------------------------------
+ADOPT_GRACE = 15.0         # Sekunden, die ein übernommener Spieler zum Wiederverbinden hat
+
+# --- Diagnose ------------------------------------------------------------------
+ADMIN_TOKEN = os.environ.get('BLACKJACK_ADMIN_TOKEN')  # ohne Token sind Admin-Befehle aus
+SLOW_ACTION_MS = 50        # Aktionen, die länger dauern, werden mit Phasen geloggt
+PROFILE_DIR = 'profiles'   # Zielordner für Profil-Dumps
+PROFILE_MAX_SECONDS = 300
+
+# --- Chat ----------------------------------------------------------------------
+CHAT_HISTORY = 50          # Nachrichten im Verlauf (Ringpuffer) für neue Spieler
+CHAT_FLUSH_INTERVAL = 0.05 # Sekunden, in denen Chat-Bursts zu einem Frame gebündelt werden
+CHAT_BATCH_MAX = 100       # max. Nachrichten pro Frame
+CHAT_QUEUE_MAX = 1000      # ausstehende Nachrichten, darüber werden die ältesten verworfen
+OUTBOX_CHAT_MAX = 20       # Chat-Frames je Client in der Warteschlange, darüber wird Chat verworfen
+OUTBOX_GAME_MAX = 500      # Spiel-Frames je Client; wer so weit zurückliegt, wird getrennt
+
 # --- Hilfsfunktionen ---------------------------------------------------------
 
-def json_send(sock, obj):
-    data = (json.dumps(obj) + "\n").encode("utf-8")
-    sock.sendall(data)
+class TokenBucket:
+    """Einfacher Token-Bucket: `rate` Tokens pro Sekunde, maximal `burst` gespeichert."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def allow(self, cost=1.0):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+def public_state(players, game_state):
+    """Sicht der Clients auf einen Tisch (Dealerkarte ggf. verdeckt)."""
+    if not game_state['reveal_dealer'] and game_state['dealer_hand']:
+        public_dealer = ["[verdeckt]"] + game_state['dealer_hand'][1:]
+    else:
+        public_dealer = list(game_state['dealer_hand'])
+
+    return {
+        'type': 'state',
+        'rules': {
+            'max_bet': MAX_BET,
+            'start_balance': START_BALANCE
+        },
+        'players': players,
+        'game_state': {
+            'status': game_state['status'],
+            'current_player': game_state['current_player'],
+            'dealer_hand': public_dealer
+        }
+    }
+
+# --- Chat-Kanal ----------------------------------------------------------------
 
-def json_recv_lines(sock, buf):
-    while True:
-        chunk = sock.recv(4096)
-        if not chunk:
-            return False
-        buf["data"] += chunk.decode("utf-8")
-        while "\n" in buf["data"]:
-            line, buf["data"] = buf["data"].split("\n", 1)
-            line = line.strip()
-            if line:
-                yield json.loads(line)
+class ChatChannel:
+    """Chat eines Tisches: eigener Lock, eigene Queue, eigener Sende-Thread.
+
+    Nachrichten landen in einer Queue und werden vom Flush-Thread gebündelt als
+    ein `chat_batch`-Frame pro Client verschickt. Der Verlauf liegt in einem
+    Ringpuffer und geht als ein `chat_history`-Frame an neue Spieler.
+    """
+
+    def __init__(self, send, history=CHAT_HISTORY, flush_interval=CHAT_FLUSH_INTERVAL,
+                 batch_max=CHAT_BATCH_MAX, queue_max=CHAT_QUEUE_MAX):
+        self.send = send                    # callable(client, obj) -> bool
+        self.flush_interval = flush_interval
+        self.batch_max = batch_max
+        self.lock = threading.Lock()
+        self.pending = threading.Condition(self.lock)
+        self.queue = deque(maxlen=queue_max)
+        self.history = deque(maxlen=history)
+        self.members = []
+        self.dropped = 0
+        threading.Thread(target=self.flush_loop, daemon=True).start()
+
+    def join(self, client):
+        with self.lock:
+            if client not in self.members:
+                self.members.append(client)
+            history = list(self.history)
+        if history:
+            self.send(client, {'type': 'chat_history', 'messages': history})
+
+    def leave(self, client):
+        with self.lock:
+            if client in self.members:
+                self.members.remove(client)
+
+    def post(self, sender, text):
+        msg = {'from': sender, 'text': text, 'ts': int(time.time())}
+        with self.lock:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(msg)
+            self.pending.notify()
+
+    def flush_loop(self):
+        while True:
+            with self.lock:
+                while not self.queue:
+                    self.pending.wait()
+            # kurz warten, damit ein Burst in einem Frame landet
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            batch = []
+            while self.queue and len(batch) < self.batch_max:
+                batch.append(self.queue.popleft())
+            self.history.extend(batch)
+            members = list(self.members)
+        if not batch:
+            return
+        frame = {'type': 'chat_batch', 'messages': batch}
+        for c in members:
+            if not self.send(c, frame):
+                self.leave(c)
+
+# --- Sende-Warteschlange pro Client ----------------------------------------------
+
+class Outbox:
+    """Einziger Schreiber auf den Socket eines Clients.
+
+    Spiel-Frames haben Vorrang vor Chat-Frames. Kommt ein Client nicht
+    hinterher, wird zuerst sein Chat verworfen; Spielzüge warten so nie auf
+    Chat-I/O oder auf einen langsamen Leser.
+    """
+
+    def __init__(self, sock, on_dead, chat_max=OUTBOX_CHAT_MAX, game_max=OUTBOX_GAME_MAX):
+        self.sock = sock
+        self.on_dead = on_dead
+        self.chat_max = chat_max
+        self.game_max = game_max
+        self.cond = threading.Condition()
+        self.game = deque()
+        self.chat = deque()
+        self.closed = False
+        self.dropped_chat = 0
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def put(self, obj, chat=False):
+        """Frame einreihen. False, wenn der Client nicht mehr erreichbar ist."""
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        with self.cond:
+            if self.closed:
+                return False
+            if chat:
+                if len(self.chat) >= self.chat_max:
+                    self.dropped_chat += 1
+                    return True
+                self.chat.append(data)
+            else:
+                if len(self.game) >= self.game_max:
+                    # Client liest nicht mehr mit, Verbindung aufgeben
+                    self.closed = True
+                    self.cond.notify()
+                    return False
+                self.game.append(data)
+            self.cond.notify()
+        return True
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.closed and not self.game and not self.chat:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                data = self.game.popleft() if self.game else self.chat.popleft()
+            try:
+                self.sock.sendall(data)
+            except Exception:
+                self.close()
+                self.on_dead()
+                return
 
 # --- Blackjack-Server --------------------------------------------------------
 
 class BlackjackServer:
-    def __init__(self, host='0.0.0.0', port=5555, min_players=1):
+    def __init__(self, host='0.0.0.0', port=5555, min_players=1,
+                 max_connections=MAX_CONNECTIONS, client_rate=CLIENT_RATE,
+                 rate_limits=None, shed_chat_inflight=SHED_CHAT_INFLIGHT,
+                 replicator=None, table_id='main',
+                 admin_token=ADMIN_TOKEN, slow_action_ms=SLOW_ACTION_MS, profile_dir=PROFILE_DIR):
         self.host = host
         self.port = port
+        self.replicator = replicator    # replication.Replicator oder None
+        self.table_id = table_id
+        self.spectator_lock = threading.Lock()
+        self.spectators = {}    # table_id -> [client], nur Clients, die 'spectate' geschickt haben
+        self.admin_token = admin_token
+        self.slow_action_ms = slow_action_ms
+        self.profiler = SamplingProfiler(profile_dir)
+        self.tracing = threading.local()    # .phases: Phase -> Sekunden der laufenden Aktion
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind((host, port))
@@ -42,42 +249,42 @@ class BlackjackServer:
         self.nick_by_client = {}
         self.client_by_nick = {}
 
-        self.players = {}       # nickname -> dict(hand, bet, balance, status, result)
-        self.min_players = min_players
+        # Tisch-Zustand (siehe engine.py); Regeln laufen nur über engine.step()
+        self.table = engine.new_table(min_players)
 
         self.lock = threading.Lock()
-
-        self.game_state = {
-            'status': 'waiting',           # waiting, betting, playing, dealer_turn, ended
-            'current_player': None,
-            'dealer_hand': [],
-            'reveal_dealer': False,
-            'deck': []
+        self.outboxes = {}      # client -> Outbox, einziger Schreiber auf den Socket
+        self.chat = ChatChannel(self.send_chat)
+
+        # Admission Control: eigener Lock, damit Limits nie auf self.lock warten
+        self.max_connections = max_connections
+        self.client_rate = client_rate
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.shed_chat_inflight = shed_chat_inflight
+        self.admission_lock = threading.Lock()
+        self.connections = 0
+        self.inflight = 0
+        self.buckets = {}       # client -> {'*': TokenBucket, typ: TokenBucket, ...}
+        self.notice_at = {}     # client -> Zeitpunkt des letzten Drossel-Hinweises
+        self.limit_stats = {
+            'rejected_connections': 0,
+            'rate_limited': {},     # typ -> Anzahl
+            'shed_chat': 0,
         }
 
+    @property
+    def players(self):
+        return self.table['players']        # nickname -> dict(hand, bet, balance, status, result)
+
+    @property
+    def game_state(self):
+        return self.table['game_state']
+
     # ---------------- State & Broadcast ----------------
 
     def make_public_state(self):
-        with self.lock:
-            if not self.game_state['reveal_dealer'] and self.game_state['dealer_hand']:
-                public_dealer = ["[verdeckt]"] + self.game_state['dealer_hand'][1:]
-            else:
-                public_dealer = list(self.game_state['dealer_hand'])
-
-            payload = {
-                'type': 'state',
-                'rules': {
-                    'max_bet': MAX_BET,
-                    'start_balance': START_BALANCE
-                },
-                'players': self.players,
-                'game_state': {
-                    'status': self.game_state['status'],
-                    'current_player': self.game_state['current_player'],
-                    'dealer_hand': public_dealer
-                }
-            }
-            return payload
+        with self.table_lock():
+            return public_state(self.players, self.game_state)
 
     def broadcast_state(self):
         self.broadcast(self.make_public_state())
@@ -89,12 +296,12 @@ class BlackjackServer:
         self.broadcast({'type': 'info', 'message': text})
 
     def broadcast_chat(self, sender, text):
-        msg = {'type': 'chat', 'from': sender, 'text': text, 'ts': int(time.time())}
-        self.broadcast(msg)
+        # läuft über den Chat-Kanal, nie über self.lock
+        self.chat.post(sender, text)
 
     def broadcast(self, obj, exclude=None):
         dead = []
-        with self.lock:
+        with self.table_lock():
             for c in self.clients:
                 if exclude and c is exclude:
                     continue
@@ -102,223 +309,332 @@ class BlackjackServer:
                     dead.append(c)
         for c in dead:
             self.remove_client(c)
+        if self.replicator and obj.get('type') == 'state':
+            self.replicate()
 
     def safe_send(self, client, obj):
+        outbox = self.outboxes.get(client)
+        if outbox is not None:
+            return outbox.put(obj)
+        # vor dem Handshake (z.B. Ablehnung): direkt senden
         try:
             json_send(client, obj)
             return True
         except Exception:
             return False
 
-    # ---------------- Karten/Regeln --------------------
-
-    def create_deck(self):
-        suits = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-        values = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        deck = [f'{v} of {s}' for s in suits for v in values]
-        random.shuffle(deck)
-        return deck
+    def send_chat(self, client, obj):
+        outbox = self.outboxes.get(client)
+        return outbox.put(obj, chat=True) if outbox is not None else False
 
-    def draw_card(self):
-        if not self.game_state['deck']:
-            self.game_state['deck'] = self.create_deck()
-        return self.game_state['deck'].pop()
-
-    @staticmethod
-    def calculate_hand_value(hand):
-        value = 0
-        aces = 0
-        for card in hand:
-            v = card.split()[0]
-            if v in ['J', 'Q', 'K']:
-                value += 10
-            elif v == 'A':
-                value += 11
-                aces += 1
-            else:
-                value += int(v)
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-        return value
+    # ---------------- Replikation ---------------------
 
-    # ---------------- Spiel-Flow -----------------------
+    def snapshot(self):
+        with self.table_lock():
+            return engine.copy_table(self.table)
 
-    def try_enter_betting(self):
-        with self.lock:
-            if self.game_state['status'] == 'waiting' and len(self.players) >= self.min_players:
-                self.game_state['status'] = 'betting'
+    def replicate(self):
+        # Kopie und Sequenznummer im selben kritischen Abschnitt, sonst kann ein
+        # älterer Snapshot eine höhere seq bekommen; publish() reiht nur ein
+        try:
+            with self.table_lock():
+                self.replicator.publish(self.table_id, engine.copy_table(self.table))
+        except Exception as e:
+            print(f"Replikation fehlgeschlagen: {e}")
+
+    def adopt_table(self, state, table_id):
+        """Tisch aus einem replizierten Snapshot übernehmen (Failover).
+
+        Spieler behalten Guthaben und Hand; sie verbinden sich mit demselben
+        Nickname neu und landen über 'join' wieder in ihrem Eintrag. Stand der
+        Tisch mitten im Dealer-Zug, spielt dieser Knoten den Dealer zu Ende;
+        ein Spieler am Zug, der nicht innerhalb von ADOPT_GRACE Sekunden
+        zurückkommt, wird auf 'stand' gesetzt.
+
+        Ein Tisch mit eigenen Spielern wird nicht überschrieben, es sei denn, es
+        ist derselbe Tisch (ValueError).
+        """
+        table = engine.copy_table(state)
+        with self.table_lock():
+            if self.players and table_id != self.table_id:
+                raise ValueError(f"Tisch '{self.table_id}' hat noch Spieler, '{table_id}' wird nicht übernommen.")
+            self.table_id = table_id
+            self.table = table
+            status = self.game_state['status']
+        print(f"Tisch '{table_id}' übernommen (Status: {status}).")
         self.broadcast_state()
-
-    def start_round(self):
-        with self.lock:
-            active = [n for n, p in self.players.items() if p['status'] in ('waiting', 'betting', 'ready')]
-            if not active or not all(self.players[n]['bet'] > 0 for n in active):
+        if status == 'dealer_turn':
+            threading.Thread(target=self.dealer_play, daemon=True).start()
+        elif status == 'playing':
+            timer = threading.Timer(ADOPT_GRACE, self.skip_absent_players)
+            timer.daemon = True
+            timer.start()
+
+    def skip_absent_players(self):
+        while True:
+            with self.table_lock():
+                current = self.game_state['current_player']
+                if self.game_state['status'] != 'playing' or current is None or current in self.client_by_nick:
+                    return
+            print(f"{current} nicht verbunden, übernommener Tisch geht weiter.")
+            self.apply(None, {'type': 'stand', 'nickname': current})
+
+    def spectate_table(self, client, table_id):
+        """Client schaut einem Tisch eines anderen Knotens zu (None beendet das)."""
+        with self.spectator_lock:
+            for watchers in self.spectators.values():
+                if client in watchers:
+                    watchers.remove(client)
+            if table_id is None:
                 return
+            self.spectators.setdefault(table_id, []).append(client)
+        self.replicator.follow(table_id, self.forward_table_view)
+        latest = self.replicator.latest(table_id)
+        if latest:
+            self.safe_send(client, self.make_table_view(table_id, latest))
 
-            self.game_state['status'] = 'playing'
-            self.game_state['deck'] = self.create_deck()
-            self.game_state['dealer_hand'] = [self.draw_card(), self.draw_card()]
-            self.game_state['reveal_dealer'] = False
-
-            for n in active:
-                self.players[n]['hand'] = [self.draw_card(), self.draw_card()]
-                self.players[n]['status'] = 'playing'
-                self.players[n]['result'] = ''
+    @staticmethod
+    def make_table_view(table_id, state):
+        view = public_state(state['players'], state['game_state'])
+        view['type'] = 'table_view'
+        view['table'] = table_id
+        return view
+
+    def forward_table_view(self, event):
+        # läuft im Empfangs-Thread des Backends
+        table_id = event['table']
+        with self.spectator_lock:
+            watchers = list(self.spectators.get(table_id, ()))
+        if not watchers:
+            return
+        view = self.make_table_view(table_id, event['state'])
+        for c in watchers:
+            self.safe_send(c, view)
 
-            self.game_state['current_player'] = active[0]
+    # ---------------- Spiel-Flow -----------------------
 
-        self.broadcast_state()
+    def locked_step(self, action, register=None):
+        """engine.step unter self.lock; misst Lock-Wartezeit und Spiellogik."""
+        with self.table_lock():
+            t0 = time.perf_counter()
+            if register:
+                client, nickname = register
+                self.nick_by_client[client] = nickname
+                self.client_by_nick[nickname] = client
+            self.table, events = engine.step(self.table, action, copy=False)
+        self.add_phase('logic', time.perf_counter() - t0)
+        return events
+
+    def apply(self, client, action):
+        """Aktion über die Engine anwenden und die Events verteilen."""
+        self.emit(client, self.locked_step(action))
+
+    def emit(self, client, events):
+        for ev in events:
+            et = ev['type']
+            if et == 'dealer_turn':
+                self.dealer_play()
+                continue
+            t0 = time.perf_counter()
+            waited = self.phase_total('lock_wait')
+            if et == 'state':
+                self.broadcast_state()
+            elif et == 'info':
+                self.broadcast_info(ev['message'])
+            elif et == 'error':
+                if client is not None:
+                    self.safe_send(client, {'type': 'error', 'message': ev['message']})
+            # Warten auf self.lock steckt schon in 'lock_wait'
+            waited = self.phase_total('lock_wait') - waited
+            self.add_phase('broadcast', time.perf_counter() - t0 - waited)
 
-    def next_player(self):
-        with self.lock:
-            playing = [n for n, p in self.players.items() if p['status'] == 'playing']
-            if not playing:
-                self.game_state['status'] = 'dealer_turn'
-                self.game_state['reveal_dealer'] = True
-                state = self.make_public_state()
-            else:
-                curr = self.game_state['current_player']
-                idx = playing.index(curr) if curr in playing else -1
-                self.game_state['current_player'] = playing[(idx + 1) % len(playing)]
-                state = self.make_public_state()
-        self.broadcast(state)
-        if state['game_state']['status'] == 'dealer_turn':
-            self.dealer_play()
+    def try_enter_betting(self):
+        self.apply(None, {'type': 'open'})
 
     def dealer_play(self):
         while True:
-            with self.lock:
-                val = self.calculate_hand_value(self.game_state['dealer_hand'])
-                if val >= 17:
-                    break
-                self.game_state['dealer_hand'].append(self.draw_card())
-                snap = self.make_public_state()
-            self.broadcast(snap)
+            events = self.locked_step({'type': 'dealer'})
+            self.emit(None, events)
+            if not any(ev['type'] == 'dealer_draw' for ev in events):
+                break
             time.sleep(1)
+            self.add_phase('dealer_pause', 1.0)
 
-        self.determine_winners()
-        with self.lock:
-            self.game_state['status'] = 'ended'
-            self.game_state['current_player'] = None
-        self.broadcast_state()
+    # ---------------- Diagnose ------------------------
 
-    def determine_winners(self):
-        with self.lock:
-            dealer_value = self.calculate_hand_value(self.game_state['dealer_hand'])
-            for n, p in self.players.items():
-                if p['bet'] <= 0:
-                    continue
-                player_value = self.calculate_hand_value(p['hand'])
-                if p['status'] == 'busted':
-                    p['result'] = 'lose'
-                elif dealer_value > 21 or player_value > dealer_value:
-                    p['balance'] += p['bet'] * 2
-                    p['result'] = 'win'
-                elif player_value == dealer_value:
-                    p['balance'] += p['bet']
-                    p['result'] = 'push'
-                else:
-                    p['result'] = 'lose'
-
-    def reset_for_next_round(self):
+    @contextmanager
+    def table_lock(self):
+        """self.lock halten; die Wartezeit zählt als Phase 'lock_wait'."""
+        t0 = time.perf_counter()
         with self.lock:
-            for p in self.players.values():
-                p['hand'] = []
-                p['bet'] = 0
-                p['status'] = 'waiting'
-                p['result'] = ''
-            self.game_state.update({
-                'status': 'betting' if len(self.players) >= self.min_players else 'waiting',
-                'current_player': None,
-                'dealer_hand': [],
-                'reveal_dealer': False,
-                'deck': []
-            })
-        self.broadcast_state()
-
-    # ---------------- Nachrichten ---------------------
-
-    def process(self, client, msg):
-        t = msg.get('type')
+            self.add_phase('lock_wait', time.perf_counter() - t0)
+            yield
+
+    def add_phase(self, name, seconds):
+        phases = getattr(self.tracing, 'phases', None)
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + seconds
+
+    def phase_total(self, name):
+        phases = getattr(self.tracing, 'phases', None)
+        return phases.get(name, 0.0) if phases else 0.0
+
+    def trace_action(self, client, t, started):
+        """Aktion loggen, wenn sie (ohne Dealer-Pausen) über dem Schwellwert lag."""
+        phases = self.tracing.phases
+        self.tracing.phases = None
+        total = time.perf_counter() - started - phases.pop('dealer_pause', 0.0)
+        if total * 1000 < self.slow_action_ms:
+            return
+        nickname = self.nick_by_client.get(client, '?')
+        detail = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in sorted(phases.items(), key=lambda kv: -kv[1]))
+        print(f"[langsam] {t} von {nickname}: {total * 1000:.1f}ms ({detail or 'keine Phasen'})")
+
+    def handle_admin(self, client, msg):
+        token = msg.get('token')
+        if not self.admin_token or not isinstance(token, str) or \
+                not hmac.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8')):
+            print(f"Admin-Befehl abgelehnt von {self.nick_by_client.get(client, '?')}")
+            self.safe_send(client, {'type': 'error', 'message': 'Nicht berechtigt.'})
+            return
 
-        if t == 'join':
-            nickname = msg.get('nickname')
-            if not nickname:
+        cmd = msg.get('cmd')
+        if cmd == 'profile':
+            try:
+                seconds = float(msg.get('seconds', 10))
+            except Exception:
+                seconds = 0
+            if not 0 < seconds <= PROFILE_MAX_SECONDS:
+                self.safe_send(client, {'type': 'error', 'message': f'Dauer muss zwischen 0 und {PROFILE_MAX_SECONDS}s liegen.'})
                 return
-            with self.lock:
-                self.nick_by_client[client] = nickname
-                self.client_by_nick[nickname] = client
-                if nickname not in self.players:
-                    self.players[nickname] = {
-                        'hand': [],
-                        'bet': 0,
-                        'balance': START_BALANCE,
-                        'status': 'waiting',  # waiting, betting, playing, stood, busted
-                        'result': ''
-                    }
-                if self.game_state['status'] == 'waiting' and len(self.players) >= self.min_players:
-                    self.game_state['status'] = 'betting'
-            self.broadcast_info(f"{nickname} ist dem Spiel beigetreten.")
-            self.broadcast_state()
-
-        elif t == 'bet':
-            nickname = msg.get('nickname')
+            if not self.profiler.start(seconds):
+                self.safe_send(client, {'type': 'error', 'message': 'Profiler läuft bereits.'})
+                return
+            reply = {'cmd': cmd, 'seconds': seconds}
+        elif cmd == 'profile_stop':
+            reply = {'cmd': cmd, 'stopped': self.profiler.stop(), 'file': self.profiler.last_file,
+                     'error': self.profiler.last_error}
+        elif cmd == 'slow_threshold':
             try:
-                bet = int(msg.get('bet', 0))
+                self.slow_action_ms = parse_threshold(msg['ms'])
             except Exception:
-                self.safe_send(client, {'type': 'error', 'message': 'Ungültiger Einsatz'})
+                self.safe_send(client, {'type': 'error', 'message': 'Ungültiger Schwellwert'})
+                return
+            reply = {'cmd': cmd, 'ms': self.slow_action_ms}
+        elif cmd == 'adopt':
+            table_id = msg.get('table')
+            state = self.replicator.latest(table_id) if self.replicator and isinstance(table_id, str) else None
+            if state is None:
+                self.safe_send(client, {'type': 'error', 'message': f'Kein Snapshot von Tisch {table_id!r} vorhanden.'})
                 return
+            try:
+                self.adopt_table(state, table_id)
+            except ValueError as e:
+                self.safe_send(client, {'type': 'error', 'message': str(e)})
+                return
+            reply = {'cmd': cmd, 'table': table_id, 'status': self.game_state['status']}
+        elif cmd == 'status':
+            reply = {
+                'cmd': cmd,
+                'profiling': self.profiler.running,
+                'last_profile': self.profiler.last_file,
+                'last_error': self.profiler.last_error,
+                'slow_action_ms': self.slow_action_ms,
+            }
+        else:
+            self.safe_send(client, {'type': 'error', 'message': f'Unbekannter Admin-Befehl: {cmd}'})
+            return
+        self.safe_send(client, {'type': 'admin', **reply})
+
+    # ---------------- Admission Control ---------------
+
+    def _count(self, key, sub=None):
+        # Aufrufer hält self.admission_lock
+        if sub is None:
+            self.limit_stats[key] += 1
+        else:
+            self.limit_stats[key][sub] = self.limit_stats[key].get(sub, 0) + 1
+
+    def admit_message(self, client, t):
+        """Prüft Client- und Typ-Bucket. Liefert False, wenn die Nachricht verworfen wird."""
+        if not isinstance(t, str):
+            t = '?'     # unbekannter Typ, zählt nur gegen den Client-Bucket
+        with self.admission_lock:
+            buckets = self.buckets.get(client)
+            if buckets is None:
+                buckets = self.buckets[client] = {'*': TokenBucket(*self.client_rate)}
+            if t == 'chat' and self.inflight >= self.shed_chat_inflight:
+                # Überlast: Chat zuerst opfern, Spielzüge laufen weiter
+                self._count('shed_chat')
+                return False
+            if t in self.rate_limits and t not in buckets:
+                buckets[t] = TokenBucket(*self.rate_limits[t])
+            typed = buckets.get(t)
+            if not buckets['*'].allow() or (typed is not None and not typed.allow()):
+                self._count('rate_limited', t)
+                return False
+            self.inflight += 1
+            return True
 
-            with self.lock:
-                p = self.players.get(nickname)
-                if not p:
-                    return
-                if bet <= 0:
-                    self.safe_send(client, {'type': 'error', 'message': 'Einsatz muss > 0 sein'})
-                    return
-                if bet > MAX_BET:
-                    self.safe_send(client, {'type': 'error', 'message': f'Max. Einsatz ist {MAX_BET}.'})
-                    return
-                if bet > p['balance']:
-                    self.safe_send(client, {'type': 'error', 'message': 'Nicht genug Guthaben'})
-                    return
+    def admit_connection(self):
+        """Platz für eine neue Verbindung reservieren. False, wenn der Server voll ist."""
+        with self.admission_lock:
+            if self.connections >= self.max_connections:
+                self._count('rejected_connections')
+                return False
+            self.connections += 1
+            return True
 
-                p['bet'] = bet
-                p['balance'] -= bet
-                p['status'] = 'ready'
+    def throttle_notice_due(self, client):
+        # ein Hinweis pro Zeitfenster statt einer Antwort je verworfener Nachricht
+        now = time.monotonic()
+        with self.admission_lock:
+            last = self.notice_at.get(client)
+            if last is not None and now - last < THROTTLE_NOTICE_INTERVAL:
+                return False
+            self.notice_at[client] = now
+            return True
 
-            self.broadcast_state()
-            self.start_round()
+    def get_limit_stats(self):
+        with self.admission_lock:
+            return {
+                'connections': self.connections,
+                'max_connections': self.max_connections,
+                'inflight': self.inflight,
+                'rejected_connections': self.limit_stats['rejected_connections'],
+                'rate_limited': dict(self.limit_stats['rate_limited']),
+                'shed_chat': self.limit_stats['shed_chat'],
+                'chat_dropped': self.chat.dropped,
+            }
 
-        elif t == 'hit':
-            nickname = msg.get('nickname')
-            with self.lock:
-                if self.game_state['current_player'] != nickname or self.game_state['status'] != 'playing':
-                    return
-                self.players[nickname]['hand'].append(self.draw_card())
-                if self.calculate_hand_value(self.players[nickname]['hand']) > 21:
-                    self.players[nickname]['status'] = 'busted'
-            self.broadcast_state()
-            with self.lock:
-                busted_now = self.players[nickname]['status'] == 'busted'
-            if busted_now:
-                self.next_player()
+    # ---------------- Nachrichten ---------------------
+
+    def dispatch(self, client, msg):
+        t = msg.get('type')
+        if not self.admit_message(client, t):
+            if t != 'chat' and self.throttle_notice_due(client):
+                self.safe_send(client, {'type': 'info', 'message': 'Zu viele Anfragen, bitte langsamer.'})
+            return
+        started = time.perf_counter()
+        self.tracing.phases = {}
+        try:
+            self.process(client, msg)
+        finally:
+            self.trace_action(client, t, started)
+            with self.admission_lock:
+                self.inflight -= 1
+
+    def process(self, client, msg):
+        t = msg.get('type')
 
-        elif t == 'stand':
+        if t == 'join':
             nickname = msg.get('nickname')
-            with self.lock:
-                if self.game_state['current_player'] != nickname or self.game_state['status'] != 'playing':
-                    return
-                self.players[nickname]['status'] = 'stood'
-            self.broadcast_state()
-            self.next_player()
+            if not nickname:
+                return
+            self.emit(client, self.locked_step(msg, register=(client, nickname)))
 
-        elif t == 'new_round':
-            with self.lock:
-                if self.game_state['status'] != 'ended':
-                    return
-            self.reset_for_next_round()
+        elif t in ('bet', 'hit', 'stand', 'new_round'):
+            self.apply(client, msg)
 
         elif t == 'chat':
             # Chatnachricht verteilen (mit Längenlimit)
@@ -332,6 +648,24 @@ class BlackjackServer:
                 text = text[:MAX_CHAT_LEN]
             self.broadcast_chat(nickname, text)
 
+        elif t == 'spectate':
+            # Tisch eines anderen Knotens beobachten ('table': None beendet)
+            table_id = msg.get('table')
+            if not self.replicator:
+                self.safe_send(client, {'type': 'error', 'message': 'Keine Replikation konfiguriert.'})
+                return
+            if table_id is not None and (not isinstance(table_id, str) or not table_id):
+                self.safe_send(client, {'type': 'error', 'message': 'Ungültiger Tisch'})
+                return
+            self.spectate_table(client, table_id)
+        elif t == 'admin':
+            # Diagnose: Profiler starten/stoppen, Schwellwert für langsame Aktionen
+            self.handle_admin(client, msg)
+
+        elif t == 'stats':
+            # Limits/Zähler abfragen (Beobachtbarkeit)
+            self.safe_send(client, {'type': 'stats', 'limits': self.get_limit_stats()})
+
         elif t == 'leave':
             self.remove_client(client)
 
@@ -341,15 +675,18 @@ class BlackjackServer:
         buf = {"data": ""}
         try:
             json_send(client, {'type': 'nick_request'})
+            client.settimeout(HANDSHAKE_TIMEOUT)
             raw = client.recv(4096)
+            client.settimeout(None)
             nick = raw.decode('utf-8').strip()
             if not nick:
-                client.close()
+                self.release_connection(client)
                 return
         except Exception:
-            client.close()
+            self.release_connection(client)
             return
 
+        self.outboxes[client] = Outbox(client, lambda: self.remove_client(client))
         with self.lock:
             self.clients.append(client)
             self.nick_by_client[client] = nick
@@ -357,41 +694,167 @@ class BlackjackServer:
 
         self.try_enter_betting()
         self.send_state_to(client)
+        self.chat.join(client)
 
         try:
             for msg in json_recv_lines(client, buf):
-                self.process(client, msg)
+                self.dispatch(client, msg)
         except Exception:
             pass
         finally:
             self.remove_client(client)
+            with self.admission_lock:
+                self.connections -= 1
+
+    def release_connection(self, client):
+        try:
+            client.close()
+        except Exception:
+            pass
+        with self.admission_lock:
+            self.connections -= 1
+            self.buckets.pop(client, None)
+            self.notice_at.pop(client, None)
 
     def remove_client(self, client):
-        with self.lock:
+        with self.admission_lock:
+            self.buckets.pop(client, None)
+            self.notice_at.pop(client, None)
+        self.chat.leave(client)
+        outbox = self.outboxes.pop(client, None)
+        if outbox is not None:
+            outbox.close()
+        with self.spectator_lock:
+            for watchers in self.spectators.values():
+                if client in watchers:
+                    watchers.remove(client)
+        with self.table_lock():
             nickname = self.nick_by_client.pop(client, None)
             if client in self.clients:
                 self.clients.remove(client)
             if nickname and nickname in self.client_by_nick:
                 self.client_by_nick.pop(nickname, None)
-            if nickname and nickname in self.players:
-                self.players[nickname]['status'] = 'waiting'
-                self.players[nickname]['hand'] = []
-                self.players[nickname]['bet'] = 0
-                self.players[nickname]['result'] = ''
+            events = []
+            if nickname:
+                self.table, events = engine.step(self.table, {'type': 'leave', 'nickname': nickname}, copy=False)
         try:
             client.close()
         except Exception:
             pass
-        if nickname:
-            self.broadcast_info(f"{nickname} hat das Spiel verlassen.")
-            self.broadcast_state()
+        self.emit(None, events)
 
     def start(self):
         print(f"Server läuft auf {self.host}:{self.port}")
         while True:
             client, addr = self.server.accept()
+            if not self.admit_connection():
+                print(f"Abgelehnt (Server voll): {addr}")
+                self.safe_send(client, {'type': 'error', 'message': 'Server ist voll, bitte später erneut versuchen.'})
+                try:
+                    client.close()
+                except Exception:
+                    pass
+                continue
             print(f"Verbunden mit {addr}")
             threading.Thread(target=self.handle_client, args=(client,), daemon=True).start()
 
+def parse_rate(text):
+    """'RATE/BURST' -> (float, int), z.B. '2/5'."""
+    rate, burst = text.split('/')
+    return float(rate), int(burst)
+
+def parse_rate_limit(text):
+    """'TYP=RATE/BURST' -> (typ, (float, int)), z.B. 'chat=1/5'."""
+    t, sep, rate = text.partition('=')
+    if not sep or not t:
+        raise ValueError(f"erwartet TYP=RATE/BURST, nicht {text!r}")
+    return t, parse_rate(rate)
+
+def parse_threshold(value):
+    """Schwellwert in ms: endlich und >= 0 (kein nan/inf, nichts Negatives)."""
+    ms = float(value)
+    if not math.isfinite(ms) or ms < 0:
+        raise ValueError(f"Schwellwert muss endlich und >= 0 sein, nicht {value!r}")
+    return ms
+
+def make_replicator(args):
+    from replication import Replicator, SocketBroker, SocketBackend, RedisBackend
+
+    if args.backend == 'socket':
+        host, _, port = args.broker.rpartition(':')
+        if args.run_broker:
+            broker = SocketBroker(host, int(port)).start()
+            print(f"Broker läuft auf {broker.host}:{broker.port}")
+        backend = SocketBackend(host, int(port))
+    else:
+        backend = RedisBackend(args.redis_url)
+    replicator = Replicator(backend, args.node_id)
+    # eigenen Tisch immer mitverfolgen, damit ein Neustart ihn wieder übernehmen kann
+    for table_id in {args.table, *args.follow, *filter(None, [args.failover])}:
+        replicator.follow(table_id)
+    return replicator
+
+def install_failover_signal(server, table_id):
+    """SIGUSR1 übernimmt den zuletzt replizierten Stand von `table_id`."""
+    import signal
+
+    def adopt():
+        state = server.replicator.latest(table_id)
+        if state is None:
+            print(f"Kein Snapshot von Tisch '{table_id}' vorhanden.")
+            return
+        try:
+            server.adopt_table(state, table_id)
+        except ValueError as e:
+            print(f"Übernahme abgelehnt: {e}")
+
+    def on_signal(signum, frame):
+        # nicht im Signal-Handler blockieren, self.lock könnte gerade gehalten sein
+        threading.Thread(target=adopt, daemon=True).start()
+
+    signal.signal(signal.SIGUSR1, on_signal)
+
+def main():
+    import argparse
+    import uuid
+
+    ap = argparse.ArgumentParser(description="Blackjack-Server")
+    ap.add_argument('--host', default='0.0.0.0')
+    ap.add_argument('--port', type=int, default=5555)
+    ap.add_argument('--min-players', type=int, default=1)
+    ap.add_argument('--max-connections', type=int, default=MAX_CONNECTIONS)
+    ap.add_argument('--client-rate', type=parse_rate, default=CLIENT_RATE, metavar='RATE/BURST',
+                    help="Limit über alle Nachrichten eines Clients")
+    ap.add_argument('--rate-limit', type=parse_rate_limit, action='append', default=[], metavar='TYP=RATE/BURST',
+                    help="Limit je Nachrichtentyp, überschreibt den Standardwert (mehrfach möglich)")
+    ap.add_argument('--shed-chat-inflight', type=int, default=SHED_CHAT_INFLIGHT)
+    ap.add_argument('--table', default='main', help="ID des eigenen Tisches")
+    ap.add_argument('--backend', choices=['none', 'socket', 'redis'], default='none',
+                    help="Pub/Sub-Backend für die Replikation zwischen Knoten")
+    ap.add_argument('--node-id', default=f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}")
+    ap.add_argument('--broker', default='127.0.0.1:6000', help="host:port des SocketBrokers")
+    ap.add_argument('--run-broker', action='store_true', help="SocketBroker in diesem Prozess starten")
+    ap.add_argument('--redis-url', default='redis://localhost:6379/0')
+    ap.add_argument('--follow', action='append', default=[],
+                    help="weitere Tische mitverfolgen (Zuschauer, 'adopt' per Admin-Befehl)")
+    ap.add_argument('--slow-action-ms', type=parse_threshold, default=SLOW_ACTION_MS,
+                    help="Aktionen über diesem Wert werden mit Phasen geloggt")
+    ap.add_argument('--failover', metavar='TABLE',
+                    help="Tisch mitverfolgen und bei SIGUSR1 übernehmen (nach Ausfall des anderen Knotens)")
+    args = ap.parse_args()
+
+    replicator = make_replicator(args) if args.backend != 'none' else None
+    server = BlackjackServer(args.host, args.port, args.min_players,
+                             max_connections=args.max_connections, client_rate=args.client_rate,
+                             rate_limits={**RATE_LIMITS, **dict(args.rate_limit)},
+                             shed_chat_inflight=args.shed_chat_inflight,
+                             replicator=replicator, table_id=args.table,
+                             slow_action_ms=args.slow_action_ms)
+    if args.failover:
+        if replicator is None:
+            ap.error("--failover benötigt --backend socket oder redis")
+        install_failover_signal(server, args.failover)
+    server.start()
+
 if __name__ == "__main__":
-    BlackjackServer().start()
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import engine
+
+# Durchsatz der Spiel-Engine ohne Netzwerk: viele Tische, je Runde eine Aktion
+# pro Tisch über engine.step_batch().
+#
+#   python bench_engine.py --tables 5000 --steps 200
+
+PLAYERS = ['anna', 'ben', 'cem']
+
+def next_action(table):
+    """Einfache Strategie: setzen, bis 17 ziehen, Dealer spielen, neue Runde."""
+    gs = table['game_state']
+    status = gs['status']
+    if status == 'betting':
+        for n, p in table['players'].items():
+            if p['bet'] == 0:
+                return {'type': 'bet', 'nickname': n, 'bet': 1 if p['balance'] > 0 else 0}
+    elif status == 'playing':
+        n = gs['current_player']
+        if engine.hand_value(table['players'][n]['hand']) < 17:
+            return {'type': 'hit', 'nickname': n}
+        return {'type': 'stand', 'nickname': n}
+    elif status == 'dealer_turn':
+        return {'type': 'dealer'}
+    elif status == 'ended':
+        return {'type': 'new_round'}
+    return None
+
+def setup(tables):
+    out = []
+    for i in range(tables):
+        t = engine.new_table(min_players=len(PLAYERS), seed=i)
+        for n in PLAYERS:
+            t, _ = engine.step(t, {'type': 'join', 'nickname': n}, copy=False)
+        out.append(t)
+    return out
+
+def run(tables, steps, copy):
+    states = setup(tables)
+    actions_done = 0
+    rounds = 0
+    policy_time = 0.0
+    engine_time = 0.0
+    for _ in range(steps):
+        t0 = time.perf_counter()
+        actions = [next_action(t) for t in states]
+        t1 = time.perf_counter()
+        states, events = engine.step_batch(states, actions, copy=copy)
+        t2 = time.perf_counter()
+        policy_time += t1 - t0
+        engine_time += t2 - t1
+        actions_done += sum(1 for a in actions if a)
+        rounds += sum(1 for evs in events for ev in evs if ev['type'] == 'round_ended')
+    print(f"copy={copy!s:5s} {actions_done:9d} Aktionen  "
+          f"Engine {actions_done / engine_time:11.0f}/s  "
+          f"(Strategie {policy_time:.2f}s, Engine {engine_time:.2f}s, {rounds} Runden)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark für engine.step_batch")
+    ap.add_argument('--tables', type=int, default=5000)
+    ap.add_argument('--steps', type=int, default=200)
+    args = ap.parse_args()
+
+    run(args.tables, args.steps, copy=False)
+    run(args.tables, args.steps, copy=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import threading
+import time
+
+from replication import InProcessBroker, SocketBroker, SocketBackend, RedisBackend, Replicator
+
+# Misst die Latenz Knoten A -> Backend -> Knoten B für replizierte Tisch-Snapshots.
+#
+#   python bench_replication.py                      # inprocess + socket
+#   python bench_replication.py --backend redis --redis-url redis://localhost:6379/0
+
+def sample_state(players):
+    return {
+        'players': {
+            f'spieler{i}': {
+                'hand': ['10 of Hearts', '7 of Clubs'],
+                'bet': 50,
+                'balance': 450,
+                'status': 'playing',
+                'result': ''
+            } for i in range(players)
+        },
+        'game_state': {
+            'status': 'playing',
+            'current_player': 'spieler0',
+            'dealer_hand': ['K of Spades', '6 of Diamonds'],
+            'reveal_dealer': False,
+            'deck': ['2 of Hearts'] * 40
+        }
+    }
+
+def make_backends(name, args):
+    if name == 'inprocess':
+        broker = InProcessBroker()
+        return broker, broker, None
+    if name == 'socket':
+        broker = SocketBroker().start()
+        return SocketBackend(broker.host, broker.port), SocketBackend(broker.host, broker.port), broker
+    if name == 'redis':
+        return RedisBackend(args.redis_url), RedisBackend(args.redis_url), None
+    raise ValueError(name)
+
+def run(name, args):
+    pub_backend, sub_backend, broker = make_backends(name, args)
+    node_a = Replicator(pub_backend, 'node-a')
+    node_b = Replicator(sub_backend, 'node-b')
+
+    sent = {}
+    latencies = []
+    done = threading.Event()
+
+    def on_event(event):
+        latencies.append(time.perf_counter() - sent[event['seq']])
+        if len(latencies) >= args.events:
+            done.set()
+
+    node_b.follow('bench', on_event)
+    time.sleep(0.2)     # Abo muss beim Broker angekommen sein
+
+    state = sample_state(args.players)
+    start = time.perf_counter()
+    for i in range(1, args.events + 1):
+        sent[i] = time.perf_counter()
+        node_a.publish('bench', state)
+        if args.interval:
+            time.sleep(args.interval)
+    done.wait(timeout=30)
+    elapsed = time.perf_counter() - start
+
+    for b in {id(pub_backend): pub_backend, id(sub_backend): sub_backend}.values():
+        b.close()
+    if broker is not None:
+        broker.close()
+
+    if not latencies:
+        print(f"{name:10s} keine Events empfangen")
+        return
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda q: latencies[min(n - 1, int(q * n))] * 1e6
+    print(f"{name:10s} {n:6d} Events  {n / elapsed:9.0f}/s  "
+          f"p50 {pct(0.50):8.1f}µs  p99 {pct(0.99):8.1f}µs  max {latencies[-1] * 1e6:8.1f}µs")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark für Cross-Node-Replikation")
+    ap.add_argument('--backend', action='append', choices=['inprocess', 'socket', 'redis'])
+    ap.add_argument('--events', type=int, default=2000)
+    ap.add_argument('--players', type=int, default=6)
+    ap.add_argument('--interval', type=float, default=0.0005, help="Pause zwischen Events (s)")
+    ap.add_argument('--redis-url', default='redis://localhost:6379/0')
+    args = ap.parse_args()
+
+    for name in args.backend or ['inprocess', 'socket']:
+        run(name, args)
+
+if __name__ == "__main__":
+    main()
@@ -105,6 +105,8 @@ class BlackjackClient:
         self.stand_btn.pack(side=tk.LEFT, padx=5)
         self.new_round_btn = tk.Button(self.action_frame, text="Neue Runde", command=self.new_round, state=tk.DISABLED)
         self.new_round_btn.pack(side=tk.LEFT, padx=5)
+        self.spectate_btn = tk.Button(self.action_frame, text="Zuschauen", command=self.spectate)
+        self.spectate_btn.pack(side=tk.LEFT, padx=5)
 
         # Andere Spieler
         self.others_frame = tk.LabelFrame(left, text="Andere Spieler")
@@ -210,11 +212,33 @@ class BlackjackClient:
             self.window.after(0, lambda: messagebox.showerror("Fehler", msg.get('message', 'Unbekannter Fehler')))
 
         elif t == 'chat':
-            sender = msg.get('from', '?')
-            text = msg.get('text', '')
-            ts = msg.get('ts')
-            timestr = time.strftime("%H:%M:%S", time.localtime(ts)) if ts else "--:--:--"
-            self.window.after(0, lambda: self.append_chat(f"[{timestr}] {sender}: {text}"))
+            self.window.after(0, lambda: self.append_chat(self.format_chat(msg)))
+
+        elif t == 'table_view':
+            # fremder Tisch (Zuschauer), ersetzt nicht den eigenen Spielstand
+            self.window.after(0, lambda: self.append_log(self.format_table_view(msg)))
+
+        elif t in ('chat_batch', 'chat_history'):
+            lines = [self.format_chat(m) for m in msg.get('messages') or []]
+            if lines:
+                self.window.after(0, lambda: self.append_chat("\n".join(lines)))
+
+    def format_table_view(self, msg):
+        g = msg.get('game_state', {})
+        dealer = g.get('dealer_hand', [])
+        parts = [f"Dealer: {', '.join(dealer) if dealer else '-'} ({self.calculate_hand_value(dealer) if dealer else '-'})"]
+        for name, p in (msg.get('players') or {}).items():
+            h = p.get('hand', [])
+            parts.append(f"{name}: {', '.join(h) if h else '-'} [{p.get('status', '-')}]")
+        return f"[Tisch {msg.get('table')}] {g.get('status', '?')} | " + " | ".join(parts)
+
+    @staticmethod
+    def format_chat(msg):
+        sender = msg.get('from', '?')
+        text = msg.get('text', '')
+        ts = msg.get('ts')
+        timestr = time.strftime("%H:%M:%S", time.localtime(ts)) if ts else "--:--:--"
+        return f"[{timestr}] {sender}: {text}"
 
     # ---------------- UI & Aktionen ------------------------------------------
 
@@ -341,6 +365,14 @@ class BlackjackClient:
             return
         json_send(self.client, {'type': 'stand', 'nickname': self.nickname})
 
+    def spectate(self):
+        if not self.connected:
+            return
+        table = simpledialog.askstring("Zuschauen", "Tisch-ID (leer = beenden):", parent=self.window)
+        if table is None:
+            return
+        json_send(self.client, {'type': 'spectate', 'table': table.strip() or None})
+
     def new_round(self):
         if not self.connected:
             return
@@ -0,0 +1,296 @@
+import random
+
+# Reine Blackjack-Regeln ohne Sockets, Locks oder Sleeps.
+#
+#   table = new_table(min_players=1, seed=42)
+#   table, events = step(table, {'type': 'join', 'nickname': 'anna'})
+#
+# Ein Tisch ist ein einfaches dict (JSON-serialisierbar):
+#   {'players': {nick: {...}}, 'game_state': {...}, 'min_players': n, 'seed': s}
+# Das Deck wird aus `seed` gemischt, damit jeder Ablauf reproduzierbar ist.
+#
+# Aktionen (dict mit 'type'):
+#   open       - Wartephase -> Einsatzphase, sobald genug Spieler da sind
+#   join       - Spieler anlegen ('nickname')
+#   bet        - Einsatz setzen ('nickname', 'bet'); startet ggf. die Runde
+#   hit/stand  - Zug des aktuellen Spielers ('nickname')
+#   dealer     - eine Dealer-Aktion: Karte ziehen oder Runde abrechnen
+#   new_round  - nach Rundenende alles zurücksetzen
+#   leave      - Spieler zurücksetzen ('nickname')
+#
+# Events (dicts, in Reihenfolge):
+#   {'type': 'state'}                    Tisch hat sich geändert
+#   {'type': 'info', 'message': ...}     Hinweis an alle
+#   {'type': 'error', 'message': ...}    Fehler an den Auslöser
+#   {'type': 'dealer_turn'}              alle Spieler fertig, Dealer ist dran
+#   {'type': 'dealer_draw', 'card': c}   Dealer hat gezogen
+#   {'type': 'round_ended'}              Runde abgerechnet
+
+MAX_BET = 100_000      # hartes Einsatz-Limit
+START_BALANCE = 100    # Startguthaben pro Spieler
+
+SUITS = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
+VALUES = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+CARDS = [f'{v} of {s}' for s in SUITS for v in VALUES]
+# Kartenwert vorab berechnet, Ass zählt zunächst 11
+POINTS = {c: (10 if c.split()[0] in ('J', 'Q', 'K') else 11 if c.startswith('A ') else int(c.split()[0]))
+          for c in CARDS}
+
+# --- Tisch & Karten ------------------------------------------------------------
+
+def new_table(min_players=1, seed=None):
+    if seed is None:
+        seed = random.getrandbits(64)
+    return {
+        'players': {},
+        'game_state': {
+            'status': 'waiting',           # waiting, betting, playing, dealer_turn, ended
+            'current_player': None,
+            'dealer_hand': [],
+            'reveal_dealer': False,
+            'deck': []
+        },
+        'min_players': min_players,
+        'seed': seed,
+    }
+
+def copy_table(table):
+    gs = table['game_state']
+    return {
+        'players': {n: {**p, 'hand': list(p['hand'])} for n, p in table['players'].items()},
+        'game_state': {**gs, 'dealer_hand': list(gs['dealer_hand']), 'deck': list(gs['deck'])},
+        'min_players': table['min_players'],
+        'seed': table['seed'],
+    }
+
+def create_deck(table):
+    rng = random.Random(table['seed'])
+    deck = list(CARDS)
+    rng.shuffle(deck)
+    table['seed'] = rng.getrandbits(64)
+    return deck
+
+def draw_card(table):
+    gs = table['game_state']
+    if not gs['deck']:
+        gs['deck'] = create_deck(table)
+    return gs['deck'].pop()
+
+def hand_value(hand):
+    value = 0
+    aces = 0
+    for card in hand:
+        points = POINTS[card]
+        value += points
+        if points == 11:
+            aces += 1
+    while value > 21 and aces > 0:
+        value -= 10
+        aces -= 1
+    return value
+
+# --- Regeln --------------------------------------------------------------------
+
+def _open(table, action):
+    gs = table['game_state']
+    if gs['status'] == 'waiting' and len(table['players']) >= table['min_players']:
+        gs['status'] = 'betting'
+    return [{'type': 'state'}]
+
+def _join(table, action):
+    nickname = action.get('nickname')
+    if not nickname:
+        return []
+    if nickname not in table['players']:
+        table['players'][nickname] = {
+            'hand': [],
+            'bet': 0,
+            'balance': START_BALANCE,
+            'status': 'waiting',  # waiting, betting, playing, stood, busted
+            'result': ''
+        }
+    _open(table, action)
+    return [{'type': 'info', 'message': f"{nickname} ist dem Spiel beigetreten."}, {'type': 'state'}]
+
+def _start_round(table):
+    players = table['players']
+    gs = table['game_state']
+    active = [n for n, p in players.items() if p['status'] in ('waiting', 'betting', 'ready')]
+    if not active or not all(players[n]['bet'] > 0 for n in active):
+        return False
+
+    gs['status'] = 'playing'
+    gs['deck'] = create_deck(table)
+    gs['dealer_hand'] = [draw_card(table), draw_card(table)]
+    gs['reveal_dealer'] = False
+
+    for n in active:
+        players[n]['hand'] = [draw_card(table), draw_card(table)]
+        players[n]['status'] = 'playing'
+        players[n]['result'] = ''
+
+    gs['current_player'] = active[0]
+    return True
+
+def _bet(table, action):
+    try:
+        bet = int(action.get('bet', 0))
+    except Exception:
+        return [{'type': 'error', 'message': 'Ungültiger Einsatz'}]
+
+    p = table['players'].get(action.get('nickname'))
+    if not p:
+        return []
+    if bet <= 0:
+        return [{'type': 'error', 'message': 'Einsatz muss > 0 sein'}]
+    if bet > MAX_BET:
+        return [{'type': 'error', 'message': f'Max. Einsatz ist {MAX_BET}.'}]
+    if bet > p['balance']:
+        return [{'type': 'error', 'message': 'Nicht genug Guthaben'}]
+
+    p['bet'] = bet
+    p['balance'] -= bet
+    p['status'] = 'ready'
+    _start_round(table)
+    return [{'type': 'state'}]
+
+def _next_player(table):
+    gs = table['game_state']
+    playing = [n for n, p in table['players'].items() if p['status'] == 'playing']
+    if not playing:
+        gs['status'] = 'dealer_turn'
+        gs['reveal_dealer'] = True
+        return [{'type': 'state'}, {'type': 'dealer_turn'}]
+    curr = gs['current_player']
+    idx = playing.index(curr) if curr in playing else -1
+    gs['current_player'] = playing[(idx + 1) % len(playing)]
+    return [{'type': 'state'}]
+
+def _is_turn(table, nickname):
+    gs = table['game_state']
+    return gs['current_player'] == nickname and gs['status'] == 'playing'
+
+def _hit(table, action):
+    nickname = action.get('nickname')
+    if not _is_turn(table, nickname):
+        return []
+    p = table['players'][nickname]
+    p['hand'].append(draw_card(table))
+    if hand_value(p['hand']) > 21:
+        p['status'] = 'busted'
+        return _next_player(table)
+    return [{'type': 'state'}]
+
+def _stand(table, action):
+    nickname = action.get('nickname')
+    if not _is_turn(table, nickname):
+        return []
+    table['players'][nickname]['status'] = 'stood'
+    return _next_player(table)
+
+def _settle(table):
+    dealer_value = hand_value(table['game_state']['dealer_hand'])
+    for p in table['players'].values():
+        if p['bet'] <= 0:
+            continue
+        player_value = hand_value(p['hand'])
+        if p['status'] == 'busted':
+            p['result'] = 'lose'
+        elif dealer_value > 21 or player_value > dealer_value:
+            p['balance'] += p['bet'] * 2
+            p['result'] = 'win'
+        elif player_value == dealer_value:
+            p['balance'] += p['bet']
+            p['result'] = 'push'
+        else:
+            p['result'] = 'lose'
+
+def _dealer(table, action):
+    gs = table['game_state']
+    if gs['status'] != 'dealer_turn':
+        return []
+    if hand_value(gs['dealer_hand']) < 17:
+        card = draw_card(table)
+        gs['dealer_hand'].append(card)
+        return [{'type': 'state'}, {'type': 'dealer_draw', 'card': card}]
+    _settle(table)
+    gs['status'] = 'ended'
+    gs['current_player'] = None
+    return [{'type': 'state'}, {'type': 'round_ended'}]
+
+def _new_round(table, action):
+    gs = table['game_state']
+    if gs['status'] != 'ended':
+        return []
+    for p in table['players'].values():
+        p['hand'] = []
+        p['bet'] = 0
+        p['status'] = 'waiting'
+        p['result'] = ''
+    gs.update({
+        'status': 'betting' if len(table['players']) >= table['min_players'] else 'waiting',
+        'current_player': None,
+        'dealer_hand': [],
+        'reveal_dealer': False,
+        'deck': []
+    })
+    return [{'type': 'state'}]
+
+def _leave(table, action):
+    nickname = action.get('nickname')
+    if not nickname:
+        return []
+    p = table['players'].get(nickname)
+    if p:
+        p['status'] = 'waiting'
+        p['hand'] = []
+        p['bet'] = 0
+        p['result'] = ''
+    return [{'type': 'info', 'message': f"{nickname} hat das Spiel verlassen."}, {'type': 'state'}]
+
+HANDLERS = {
+    'open': _open,
+    'join': _join,
+    'bet': _bet,
+    'hit': _hit,
+    'stand': _stand,
+    'dealer': _dealer,
+    'new_round': _new_round,
+    'leave': _leave,
+}
+
+# --- API -----------------------------------------------------------------------
+
+def step(table, action, copy=True):
+    """Eine Aktion anwenden. Gibt (neuer Tisch, Events) zurück.
+
+    Mit copy=False wird `table` direkt verändert und zurückgegeben; das spart
+    die Kopie, wenn der Aufrufer den alten Zustand nicht mehr braucht.
+    """
+    handler = HANDLERS.get(action.get('type'))
+    if handler is None:
+        return table, []
+    if copy:
+        table = copy_table(table)
+    return table, handler(table, action)
+
+def step_batch(tables, actions, copy=True):
+    """Je eine Aktion auf viele Tische anwenden.
+
+    `actions[i]` gehört zu `tables[i]`; None lässt den Tisch unverändert.
+    Gibt (Liste neuer Tische, Liste der Event-Listen) zurück.
+    """
+    handlers = HANDLERS
+    new_tables = []
+    all_events = []
+    for table, action in zip(tables, actions):
+        handler = handlers.get(action.get('type')) if action else None
+        if handler is None:
+            new_tables.append(table)
+            all_events.append([])
+            continue
+        if copy:
+            table = copy_table(table)
+        all_events.append(handler(table, action))
+        new_tables.append(table)
+    return new_tables, all_events
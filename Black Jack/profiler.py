@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Sampling-Profiler für den laufenden Server.
+#
+# Ein Hintergrund-Thread liest alle `interval` Sekunden die Stacks sämtlicher
+# Threads (sys._current_frames) und zählt sie. cProfile sieht nur den Thread,
+# in dem es aktiviert wurde; hier laufen die Spieler aber in eigenen Threads.
+#
+# Ausgabe im "collapsed stack"-Format (eine Zeile pro Stack, Frames mit ';'
+# getrennt, danach die Anzahl Samples) - direkt nutzbar mit flamegraph.pl
+# oder speedscope.
+
+class SamplingProfiler:
+    def __init__(self, out_dir='profiles', interval=0.005):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.samples = Counter()
+        self.started_at = None
+        self.last_file = None
+        self.last_error = None
+        self.captures = 0
+
+    @property
+    def running(self):
+        with self.lock:
+            return self.thread is not None
+
+    def start(self, seconds):
+        """Aufnahme für `seconds` Sekunden starten. False, wenn schon eine läuft."""
+        with self.lock:
+            if self.thread is not None:
+                return False
+            self.samples = Counter()
+            self.last_error = None
+            self.captures += 1
+            self.stop_event.clear()
+            self.started_at = time.time()
+            self.thread = threading.Thread(target=self.run, args=(seconds,), daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Laufende Aufnahme vorzeitig beenden; der Dump wird trotzdem geschrieben."""
+        with self.lock:
+            thread = self.thread
+        if thread is None:
+            return False
+        self.stop_event.set()
+        thread.join()
+        return True
+
+    def run(self, seconds):
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        path = None
+        try:
+            while time.monotonic() < deadline and not self.stop_event.is_set():
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    self.samples[self.collapse(frame)] += 1
+                time.sleep(self.interval)
+            path = self.dump()
+            print(f"Profil geschrieben: {path}")
+        except Exception as e:
+            self.last_error = f"Profil konnte nicht geschrieben werden: {e}"
+            print(self.last_error)
+        finally:
+            with self.lock:
+                self.last_file = path
+                self.thread = None
+
+    @staticmethod
+    def collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def dump(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        ms = int(self.started_at * 1000) % 1000
+        # Zähler + PID, damit Aufnahmen in derselben Sekunde sich nicht überschreiben
+        path = os.path.join(self.out_dir, f"profile-{stamp}.{ms:03d}-{os.getpid()}-{self.captures}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
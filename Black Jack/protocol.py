@@ -0,0 +1,20 @@
+import json
+
+# JSON-Zeilen über TCP: ein Objekt pro Zeile, UTF-8.
+# Gemeinsam genutzt von Server.py und replication.py.
+
+def json_send(sock, obj):
+    data = (json.dumps(obj) + "\n").encode("utf-8")
+    sock.sendall(data)
+
+def json_recv_lines(sock, buf):
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            return False
+        buf["data"] += chunk.decode("utf-8")
+        while "\n" in buf["data"]:
+            line, buf["data"] = buf["data"].split("\n", 1)
+            line = line.strip()
+            if line:
+                yield json.loads(line)
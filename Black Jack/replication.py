@@ -0,0 +1,314 @@
+import socket
+import threading
+import json
+import time
+import itertools
+from collections import deque
+
+from protocol import json_send, json_recv_lines
+
+# Replikation von Tischzuständen zwischen mehreren Server-Knoten.
+#
+# Jeder Knoten veröffentlicht nach jeder Zustandsänderung einen Snapshot seines
+# Tisches über ein austauschbares Pub/Sub-Backend. Andere Knoten können dem
+# Kanal folgen (Zuschauer) oder den Tisch aus dem letzten Snapshot übernehmen
+# (Failover).
+#
+# Backends:
+#   InProcessBroker  - alles im selben Prozess (Tests, Benchmarks)
+#   SocketBroker     - kleiner TCP-Broker auf localhost, SocketBackend als Client
+#   RedisBackend     - Redis Pub/Sub (benötigt das Paket `redis`)
+
+# --- Hilfsfunktionen ---------------------------------------------------------
+
+REPLICATION_QUEUE_MAX = 10_000    # ausstehende Snapshots, darüber werden die ältesten verworfen
+
+def table_channel(table_id):
+    return f"table:{table_id}"
+
+# --- Backends ----------------------------------------------------------------
+
+class InProcessBroker:
+    """Pub/Sub im selben Prozess. Zustellung synchron im Thread des Publishers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}   # channel -> [callback]
+
+    def publish(self, channel, event):
+        with self.lock:
+            callbacks = list(self.subscribers.get(channel, ()))
+        # wie über das Netz: jeder Empfänger bekommt eine eigene Kopie
+        data = json.dumps(event)
+        for cb in callbacks:
+            cb(json.loads(data))
+
+    def subscribe(self, channel, callback):
+        with self.lock:
+            self.subscribers.setdefault(channel, []).append(callback)
+
+    def unsubscribe(self, channel, callback):
+        with self.lock:
+            cbs = self.subscribers.get(channel, [])
+            if callback in cbs:
+                cbs.remove(callback)
+
+    def close(self):
+        with self.lock:
+            self.subscribers.clear()
+
+
+class SocketBroker:
+    """Minimaler Pub/Sub-Broker über TCP (JSON-Zeilen).
+
+    Protokoll: {'op': 'sub', 'channel': c} bzw. {'op': 'pub', 'channel': c, 'event': e}.
+    Abonnenten erhalten {'channel': c, 'event': e}.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.host, self.port = self.server.getsockname()[:2]
+        self.lock = threading.Lock()
+        self.subscribers = {}   # channel -> [socket]
+        self.running = True
+
+    def start(self):
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        return self
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        buf = {"data": ""}
+        try:
+            for msg in json_recv_lines(conn, buf):
+                if msg.get('op') == 'sub':
+                    with self.lock:
+                        self.subscribers.setdefault(msg['channel'], []).append(conn)
+                elif msg.get('op') == 'pub':
+                    self.fan_out(msg['channel'], msg['event'])
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                for conns in self.subscribers.values():
+                    if conn in conns:
+                        conns.remove(conn)
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def fan_out(self, channel, event):
+        with self.lock:
+            conns = list(self.subscribers.get(channel, ()))
+        data = (json.dumps({'channel': channel, 'event': event}) + "\n").encode("utf-8")
+        for c in conns:
+            try:
+                c.sendall(data)
+            except Exception:
+                pass
+
+    def close(self):
+        self.running = False
+        try:
+            self.server.close()
+        except Exception:
+            pass
+
+
+class SocketBackend:
+    """Client für SocketBroker. Eine Verbindung zum Senden, eine zum Empfangen."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.addr = (host, port)
+        self.pub_sock = socket.create_connection(self.addr)
+        self.pub_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.pub_lock = threading.Lock()
+        self.sub_sock = None
+        self.lock = threading.Lock()
+        self.subscribers = {}   # channel -> [callback]
+
+    def publish(self, channel, event):
+        with self.pub_lock:
+            json_send(self.pub_sock, {'op': 'pub', 'channel': channel, 'event': event})
+
+    def subscribe(self, channel, callback):
+        with self.lock:
+            first = channel not in self.subscribers
+            self.subscribers.setdefault(channel, []).append(callback)
+            if self.sub_sock is None:
+                self.sub_sock = socket.create_connection(self.addr)
+                self.sub_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                threading.Thread(target=self.recv_loop, daemon=True).start()
+            if first:
+                json_send(self.sub_sock, {'op': 'sub', 'channel': channel})
+
+    def unsubscribe(self, channel, callback):
+        with self.lock:
+            cbs = self.subscribers.get(channel, [])
+            if callback in cbs:
+                cbs.remove(callback)
+
+    def recv_loop(self):
+        buf = {"data": ""}
+        try:
+            for msg in json_recv_lines(self.sub_sock, buf):
+                with self.lock:
+                    callbacks = list(self.subscribers.get(msg.get('channel'), ()))
+                for cb in callbacks:
+                    cb(msg.get('event'))
+        except Exception:
+            pass
+
+    def close(self):
+        for s in (self.pub_sock, self.sub_sock):
+            if s is None:
+                continue
+            try:
+                s.close()
+            except Exception:
+                pass
+
+
+class RedisBackend:
+    """Redis Pub/Sub. Das Paket `redis` wird erst hier importiert."""
+
+    def __init__(self, url='redis://localhost:6379/0'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RedisBackend benötigt das Paket 'redis' (pip install redis).") from e
+        self.client = redis.Redis.from_url(url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.lock = threading.Lock()
+        self.subscribers = {}   # channel -> [callback]
+        self.thread = None
+
+    def publish(self, channel, event):
+        self.client.publish(channel, json.dumps(event))
+
+    def subscribe(self, channel, callback):
+        with self.lock:
+            first = channel not in self.subscribers
+            self.subscribers.setdefault(channel, []).append(callback)
+        if first:
+            self.pubsub.subscribe(**{channel: self.on_message})
+        if self.thread is None:
+            self.thread = self.pubsub.run_in_thread(sleep_time=0.01, daemon=True)
+
+    def unsubscribe(self, channel, callback):
+        with self.lock:
+            cbs = self.subscribers.get(channel, [])
+            if callback in cbs:
+                cbs.remove(callback)
+
+    def on_message(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        event = json.loads(message['data'])
+        with self.lock:
+            callbacks = list(self.subscribers.get(channel, ()))
+        for cb in callbacks:
+            cb(event)
+
+    def close(self):
+        if self.thread is not None:
+            self.thread.stop()
+        self.pubsub.close()
+
+# --- Replikation -------------------------------------------------------------
+
+class Replicator:
+    """Veröffentlicht Tisch-Snapshots und verfolgt die Tische anderer Knoten.
+
+    Ein Event sieht so aus:
+        {'node': node_id, 'table': table_id, 'seq': n, 'sent_at': t, 'state': {...}}
+    `state` enthält die vollständigen internen Daten (inkl. verdeckter Dealerkarte
+    und Deck), damit ein anderer Knoten den Tisch übernehmen kann.
+    """
+
+    def __init__(self, backend, node_id, queue_max=REPLICATION_QUEUE_MAX):
+        self.backend = backend
+        self.node_id = node_id
+        self.seq = itertools.count(1)
+        self.lock = threading.Lock()
+        self.tables = {}        # table_id -> letztes Event
+        self.listeners = {}     # table_id -> callback(event)
+        # Versand läuft im eigenen Thread, nie im Handler-Thread eines Spielers
+        self.outbox = deque(maxlen=queue_max)
+        self.pending = threading.Condition(threading.Lock())
+        self.dropped = 0
+        threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def publish(self, table_id, state):
+        """Snapshot zum Versand einreihen; kehrt sofort zurück."""
+        with self.pending:
+            event = {
+                'node': self.node_id,
+                'table': table_id,
+                'seq': next(self.seq),
+                'sent_at': time.time(),
+                'state': state,
+            }
+            if len(self.outbox) == self.outbox.maxlen:
+                self.dropped += 1
+            self.outbox.append(event)
+            self.pending.notify()
+        return event
+
+    def send_loop(self):
+        while True:
+            with self.pending:
+                while not self.outbox:
+                    self.pending.wait()
+                event = self.outbox.popleft()
+            try:
+                self.backend.publish(table_channel(event['table']), event)
+            except Exception as e:
+                print(f"Replikation fehlgeschlagen: {e}")
+
+    def follow(self, table_id, callback=None):
+        """Tisch eines anderen Knotens verfolgen (z.B. für Zuschauer).
+
+        Ein bereits gesetzter Callback bleibt erhalten, wenn `callback` None ist.
+        """
+        with self.lock:
+            known = table_id in self.listeners
+            if callback is not None or not known:
+                self.listeners[table_id] = callback
+        if not known:
+            self.backend.subscribe(table_channel(table_id), self.on_event)
+
+    def on_event(self, event):
+        if event.get('node') == self.node_id:
+            return
+        table_id = event.get('table')
+        with self.lock:
+            last = self.tables.get(table_id)
+            # veraltete Events (gleicher Knoten, kleinere Sequenz) ignorieren
+            if last and last['node'] == event['node'] and last['seq'] >= event['seq']:
+                return
+            self.tables[table_id] = event
+            callback = self.listeners.get(table_id)
+        if callback:
+            callback(event)
+
+    def latest(self, table_id):
+        with self.lock:
+            event = self.tables.get(table_id)
+        return event['state'] if event else None
+
+    def close(self):
+        self.backend.close()
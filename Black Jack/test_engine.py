@@ -0,0 +1,120 @@
+import engine
+
+
+def table_with(*nicks, seed=1):
+    table = engine.new_table(min_players=len(nicks), seed=seed)
+    for n in nicks:
+        table, _ = engine.step(table, {'type': 'join', 'nickname': n}, copy=False)
+    return table
+
+def types(events):
+    return [ev['type'] for ev in events]
+
+def play_round(table, **bets):
+    for n, bet in bets.items():
+        table, _ = engine.step(table, {'type': 'bet', 'nickname': n, 'bet': bet}, copy=False)
+    return table
+
+
+def test_bet_validation():
+    table = table_with('anna')
+    cases = [('x', 'Ungültiger Einsatz'), (0, 'Einsatz muss > 0 sein'),
+             (engine.MAX_BET + 1, f'Max. Einsatz ist {engine.MAX_BET}.'),
+             (engine.START_BALANCE + 1, 'Nicht genug Guthaben')]
+    for bet, message in cases:
+        new, events = engine.step(table, {'type': 'bet', 'nickname': 'anna', 'bet': bet})
+        assert events == [{'type': 'error', 'message': message}]
+        assert new['players']['anna']['bet'] == 0
+
+    new, events = engine.step(table, {'type': 'bet', 'nickname': 'anna', 'bet': 30})
+    assert types(events) == ['state']
+    assert new['players']['anna']['balance'] == engine.START_BALANCE - 30
+    assert new['game_state']['status'] == 'playing'
+    # Ausgangstisch bleibt unverändert
+    assert table['players']['anna']['balance'] == engine.START_BALANCE
+    assert table['game_state']['status'] == 'betting'
+
+def test_bust_moves_to_next_player_then_dealer():
+    table = play_round(table_with('anna', 'ben'), anna=10, ben=10)
+    assert table['game_state']['current_player'] == 'anna'
+
+    table['players']['anna']['hand'] = ['K of Hearts', 'Q of Hearts']
+    table['game_state']['deck'].append('5 of Clubs')
+    table, events = engine.step(table, {'type': 'hit', 'nickname': 'anna'})
+    assert table['players']['anna']['status'] == 'busted'
+    assert table['game_state']['current_player'] == 'ben'
+    assert types(events) == ['state']
+
+    # nicht am Zug -> wird ignoriert
+    _, events = engine.step(table, {'type': 'hit', 'nickname': 'anna'})
+    assert events == []
+
+    table, events = engine.step(table, {'type': 'stand', 'nickname': 'ben'})
+    assert types(events) == ['state', 'dealer_turn']
+    assert table['game_state']['status'] == 'dealer_turn'
+    assert table['game_state']['reveal_dealer']
+
+def test_dealer_draws_to_17_then_settles():
+    table = play_round(table_with('anna'), anna=10)
+    table['players']['anna']['hand'] = ['10 of Hearts', '9 of Hearts']
+    table['game_state']['dealer_hand'] = ['10 of Clubs', '4 of Clubs']
+    table['game_state']['deck'].extend(['3 of Spades', '2 of Spades'])   # gezogen: 2, dann 3
+    table, _ = engine.step(table, {'type': 'stand', 'nickname': 'anna'})
+
+    table, events = engine.step(table, {'type': 'dealer'})
+    assert events[1] == {'type': 'dealer_draw', 'card': '2 of Spades'}
+    table, events = engine.step(table, {'type': 'dealer'})
+    assert events[1] == {'type': 'dealer_draw', 'card': '3 of Spades'}
+    table, events = engine.step(table, {'type': 'dealer'})
+    assert types(events) == ['state', 'round_ended']
+    assert table['game_state']['status'] == 'ended'
+    assert table['players']['anna']['result'] == 'push'
+
+def test_settlement_win_push_lose():
+    table = play_round(table_with('win', 'push', 'lose', 'bust'), win=10, push=10, lose=10, bust=10)
+    table['game_state'].update({'status': 'dealer_turn', 'dealer_hand': ['10 of Clubs', '8 of Clubs']})
+    hands = {'win': ['10 of Hearts', '9 of Hearts'], 'push': ['10 of Spades', '8 of Spades'],
+             'lose': ['10 of Diamonds', '7 of Diamonds'], 'bust': ['K of Hearts', 'Q of Hearts', '2 of Hearts']}
+    for n, hand in hands.items():
+        table['players'][n]['hand'] = hand
+        table['players'][n]['status'] = 'stood'
+    table['players']['bust']['status'] = 'busted'
+
+    table, _ = engine.step(table, {'type': 'dealer'})
+    players = table['players']
+    assert {n: p['result'] for n, p in players.items()} == \
+        {'win': 'win', 'push': 'push', 'lose': 'lose', 'bust': 'lose'}
+    assert players['win']['balance'] == engine.START_BALANCE + 10
+    assert players['push']['balance'] == engine.START_BALANCE
+    assert players['lose']['balance'] == engine.START_BALANCE - 10
+
+def test_seed_replay_is_deterministic():
+    actions = [{'type': 'join', 'nickname': 'anna'}, {'type': 'bet', 'nickname': 'anna', 'bet': 5},
+               {'type': 'hit', 'nickname': 'anna'}, {'type': 'stand', 'nickname': 'anna'}] + \
+              [{'type': 'dealer'}] * 10
+
+    def replay(seed):
+        table = engine.new_table(seed=seed)
+        log = []
+        for action in actions:
+            table, events = engine.step(table, action)
+            log.append(events)
+        return table, log
+
+    assert replay(7) == replay(7)
+    assert replay(7)[0]['players'] != replay(8)[0]['players']
+
+def test_events_are_fresh_objects():
+    table = table_with('anna')
+    _, events = engine.step(table, {'type': 'open'})
+    events[0]['hacked'] = 1
+    _, events = engine.step(table, {'type': 'open'})
+    assert events == [{'type': 'state'}]
+
+def test_step_batch_matches_step():
+    tables = [table_with('anna', seed=s) for s in range(3)]
+    actions = [{'type': 'bet', 'nickname': 'anna', 'bet': 5}, None, {'type': 'unknown'}]
+    new, events = engine.step_batch(tables, actions)
+    assert new[0] == engine.step(tables[0], actions[0])[0]
+    assert new[1] is tables[1] and new[2] is tables[2]
+    assert events[1:] == [[], []]
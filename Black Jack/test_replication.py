@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+import Server
+from Server import BlackjackServer
+from replication import InProcessBroker, Replicator
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs):
+        srv = BlackjackServer('127.0.0.1', 0, **kwargs)
+        servers.append(srv)
+        return srv
+
+    yield make
+    for srv in servers:
+        srv.server.close()
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return cond()
+
+def make_event(node, seq, status='playing', table='main'):
+    return {'node': node, 'table': table, 'seq': seq, 'sent_at': 0.0,
+            'state': {'players': {}, 'game_state': {'status': status}}}
+
+def player(hand, status='playing', bet=10):
+    return {'hand': hand, 'bet': bet, 'balance': 90, 'status': status, 'result': ''}
+
+def table_state(players, status, current=None, dealer_hand=()):
+    return {
+        'players': players,
+        'game_state': {
+            'status': status,
+            'current_player': current,
+            'dealer_hand': list(dealer_hand),
+            'reveal_dealer': status == 'dealer_turn',
+            'deck': ['2 of Hearts'] * 10,
+        },
+        'min_players': 1,
+        'seed': 7,
+    }
+
+
+# --- Backend / Replicator -------------------------------------------------------
+
+def test_inprocess_broker_delivers_copies():
+    broker = InProcessBroker()
+    got_a, got_b = [], []
+    broker.subscribe('table:main', got_a.append)
+    broker.subscribe('table:main', got_b.append)
+    broker.subscribe('table:other', lambda e: pytest.fail("falscher Kanal"))
+    event = {'state': {'players': {}}}
+    broker.publish('table:main', event)
+    assert got_a == got_b == [event]
+    # jeder Empfänger hat seine eigene Kopie
+    got_a[0]['state']['players']['x'] = 1
+    assert got_b[0]['state']['players'] == {} and event['state']['players'] == {}
+    broker.unsubscribe('table:main', got_a.append)
+    broker.publish('table:main', event)
+    assert len(got_a) == 1 and len(got_b) == 2
+
+def test_replicator_ignores_own_node_and_stale_seq():
+    rep = Replicator(InProcessBroker(), 'node-b')
+    seen = []
+    rep.follow('main', seen.append)
+    rep.on_event(make_event('node-b', 1))            # eigener Knoten
+    assert rep.latest('main') is None and seen == []
+    rep.on_event(make_event('node-a', 5, 'playing'))
+    rep.on_event(make_event('node-a', 4, 'betting'))  # veraltet
+    rep.on_event(make_event('node-a', 5, 'betting'))  # doppelt
+    assert [e['seq'] for e in seen] == [5]
+    assert rep.latest('main')['game_state']['status'] == 'playing'
+    rep.on_event(make_event('node-a', 6, 'ended'))
+    assert rep.latest('main')['game_state']['status'] == 'ended'
+
+def test_follow_without_callback_keeps_existing():
+    rep = Replicator(InProcessBroker(), 'node-b')
+    seen = []
+    rep.follow('main', seen.append)
+    rep.follow('main')
+    rep.on_event(make_event('node-a', 1))
+    assert len(seen) == 1
+
+def test_publish_reaches_other_node():
+    broker = InProcessBroker()
+    node_a = Replicator(broker, 'node-a')
+    node_b = Replicator(broker, 'node-b')
+    node_b.follow('main')
+    node_a.publish('main', {'players': {'anna': {}}, 'game_state': {}})
+    assert wait_for(lambda: node_b.latest('main') is not None)
+    assert node_b.latest('main')['players'] == {'anna': {}}
+
+
+# --- Server: Replikation / Failover ------------------------------------------------
+
+def test_state_changes_are_replicated_in_order(make_server):
+    broker = InProcessBroker()
+    follower = Replicator(broker, 'node-b')
+    seen = []
+    follower.follow('main', seen.append)
+    srv = make_server(replicator=Replicator(broker, 'node-a'), table_id='main')
+    srv.process(None, {'type': 'join', 'nickname': 'anna'})
+    srv.process(None, {'type': 'join', 'nickname': 'ben'})
+    assert wait_for(lambda: 'ben' in (follower.latest('main') or {}).get('players', {}))
+    seqs = [e['seq'] for e in seen]
+    assert seqs == sorted(seqs)
+
+def test_adopt_refuses_foreign_table_with_players(make_server):
+    srv = make_server(table_id='main')
+    srv.process(None, {'type': 'join', 'nickname': 'anna'})
+    with pytest.raises(ValueError):
+        srv.adopt_table(table_state({'ben': player([])}, 'betting'), 'other')
+    assert list(srv.players) == ['anna'] and srv.table_id == 'main'
+    # derselbe Tisch darf überschrieben werden
+    srv.adopt_table(table_state({'ben': player([])}, 'betting'), 'main')
+    assert list(srv.players) == ['ben']
+
+def test_adopt_copies_state(make_server):
+    srv = make_server(table_id='standby')
+    state = table_state({'anna': player(['10 of Hearts', '7 of Clubs'])}, 'playing', 'anna')
+    srv.adopt_table(state, 'main')
+    state['players']['anna']['bet'] = 999
+    assert srv.players['anna']['bet'] == 10
+    assert srv.table_id == 'main'
+
+def test_adopt_finishes_dealer_turn(make_server):
+    srv = make_server(table_id='standby')
+    players = {'anna': player(['10 of Hearts', '9 of Clubs'], status='stood')}
+    srv.adopt_table(table_state(players, 'dealer_turn', dealer_hand=['10 of Spades', '8 of Clubs']), 'main')
+    assert wait_for(lambda: srv.game_state['status'] == 'ended')
+    assert srv.players['anna']['result'] == 'win'
+
+def test_adopt_skips_absent_player_after_grace(make_server, monkeypatch):
+    monkeypatch.setattr(Server, 'ADOPT_GRACE', 0.01)
+    srv = make_server(table_id='standby')
+    players = {'anna': player(['10 of Hearts', '9 of Clubs'])}
+    srv.adopt_table(table_state(players, 'playing', 'anna', ['10 of Spades', '8 of Clubs']), 'main')
+    assert wait_for(lambda: srv.game_state['status'] == 'ended')
+    assert srv.players['anna']['status'] == 'stood'
+    assert srv.players['anna']['result'] == 'win'
+
+def test_admin_adopt_reports_refusal(make_server):
+    broker = InProcessBroker()
+    srv = make_server(replicator=Replicator(broker, 'node-b'), table_id='standby', admin_token='geheim')
+    srv.replicator.on_event({'node': 'node-a', 'table': 'main', 'seq': 1, 'sent_at': 0.0,
+                             'state': table_state({'anna': player([])}, 'betting')})
+    sent = []
+    srv.safe_send = lambda client, obj: sent.append(obj) or True
+    srv.process(None, {'type': 'join', 'nickname': 'ben'})
+    srv.handle_admin(None, {'type': 'admin', 'token': 'geheim', 'cmd': 'adopt', 'table': 'main'})
+    assert sent[-1]['type'] == 'error' and list(srv.players) == ['ben']
+
+    srv.players.clear()     # eigener Tisch leer -> Übernahme erlaubt
+    srv.handle_admin(None, {'type': 'admin', 'token': 'geheim', 'cmd': 'adopt', 'table': 'main'})
+    assert sent[-1] == {'type': 'admin', 'cmd': 'adopt', 'table': 'main', 'status': 'betting'}
+    assert list(srv.players) == ['anna']
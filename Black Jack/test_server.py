@@ -0,0 +1,227 @@
+import json
+import threading
+import time
+
+import pytest
+
+import Server
+from Server import BlackjackServer, TokenBucket
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs):
+        srv = BlackjackServer('127.0.0.1', 0, **kwargs)
+        servers.append(srv)
+        return srv
+
+    yield make
+    for srv in servers:
+        srv.server.close()
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(Server.time, 'monotonic', clock)
+    return clock
+
+
+def test_token_bucket_burst_and_refill(clock):
+    bucket = TokenBucket(2.0, 3)
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5            # 0.5s * 2/s = 1 Token
+    assert bucket.allow()
+    assert not bucket.allow()
+    clock.now += 100            # nie mehr als burst
+    assert [bucket.allow() for _ in range(4)] == [True, True, True, False]
+
+def test_per_type_bucket_is_separate(make_server, clock):
+    srv = make_server(client_rate=(100.0, 100), rate_limits={'chat': (1.0, 2)})
+    client = object()
+    results = [srv.admit_message(client, 'chat') for _ in range(3)]
+    assert results == [True, True, False]
+    # andere Typen sind vom Chat-Limit nicht betroffen
+    assert srv.admit_message(client, 'hit')
+    # anderer Client hat eigene Buckets
+    assert srv.admit_message(object(), 'chat')
+    assert srv.get_limit_stats()['rate_limited'] == {'chat': 1}
+
+def test_client_bucket_covers_all_types(make_server, clock):
+    srv = make_server(client_rate=(1.0, 2), rate_limits={})
+    client = object()
+    assert srv.admit_message(client, 'hit')
+    assert srv.admit_message(client, 'stand')
+    assert not srv.admit_message(client, 'bet')
+    # unbekannte/unhashbare Typen zählen nur gegen den Client-Bucket
+    assert not srv.admit_message(client, ['a'])
+    assert srv.get_limit_stats()['rate_limited'] == {'bet': 1, '?': 1}
+
+def test_chat_is_shed_under_load(make_server, clock):
+    srv = make_server(shed_chat_inflight=2)
+    client = object()
+    assert srv.admit_message(client, 'hit')
+    assert srv.admit_message(client, 'chat')
+    # jetzt laufen 2 Aktionen parallel: Chat wird verworfen, Spielzüge nicht
+    assert not srv.admit_message(client, 'chat')
+    assert srv.admit_message(client, 'stand')
+    stats = srv.get_limit_stats()
+    assert stats['shed_chat'] == 1
+    assert stats['inflight'] == 3
+
+def test_connection_cap_and_stats(make_server):
+    srv = make_server(max_connections=2)
+    assert srv.admit_connection()
+    assert srv.admit_connection()
+    assert not srv.admit_connection()
+    stats = srv.get_limit_stats()
+    assert stats['connections'] == 2
+    assert stats['max_connections'] == 2
+    assert stats['rejected_connections'] == 1
+
+def test_throttle_notice_once_per_window(make_server, clock):
+    srv = make_server()
+    client = object()
+    assert srv.throttle_notice_due(client)
+    assert not srv.throttle_notice_due(client)
+    clock.now += Server.THROTTLE_NOTICE_INTERVAL
+    assert srv.throttle_notice_due(client)
+
+def test_parse_rate_limit():
+    assert Server.parse_rate('2.5/10') == (2.5, 10)
+    assert Server.parse_rate_limit('chat=1/5') == ('chat', (1.0, 5))
+    with pytest.raises(ValueError):
+        Server.parse_rate_limit('chat')
+
+# --- Chat ----------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, client, obj):
+        self.frames.append((client, obj))
+        return True
+
+def make_chat(**kwargs):
+    send = Recorder()
+    # langes Flush-Intervall: der Hintergrund-Thread kommt den Tests nicht dazwischen
+    return Server.ChatChannel(send, flush_interval=60, **kwargs), send
+
+def test_chat_burst_is_one_batch_per_client():
+    chat, send = make_chat()
+    chat.join('a')
+    chat.join('b')
+    for i in range(5):
+        chat.post('anna', f'hi{i}')
+    chat.flush()
+    assert [c for c, _ in send.frames] == ['a', 'b']
+    frame = send.frames[0][1]
+    assert frame['type'] == 'chat_batch'
+    assert [m['text'] for m in frame['messages']] == [f'hi{i}' for i in range(5)]
+
+def test_chat_history_cap_and_single_frame_on_join():
+    chat, send = make_chat(history=3)
+    for i in range(5):
+        chat.post('anna', f'hi{i}')
+    chat.flush()
+    assert send.frames == []        # noch niemand im Kanal
+    chat.join('late')
+    assert len(send.frames) == 1
+    client, frame = send.frames[0]
+    assert client == 'late' and frame['type'] == 'chat_history'
+    assert [m['text'] for m in frame['messages']] == ['hi2', 'hi3', 'hi4']
+
+def test_chat_queue_overflow_drops_oldest():
+    chat, send = make_chat(queue_max=3)
+    chat.join('a')
+    for i in range(5):
+        chat.post('anna', f'hi{i}')
+    assert chat.dropped == 2
+    chat.flush()
+    assert [m['text'] for m in send.frames[0][1]['messages']] == ['hi2', 'hi3', 'hi4']
+
+class StuckSocket:
+    """sendall blockiert, bis `release` gesetzt ist."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.sent = []
+
+    def sendall(self, data):
+        self.release.wait(5)
+        self.sent.append(json.loads(data))
+
+def test_outbox_never_blocks_game_and_drops_chat_first():
+    sock = StuckSocket()
+    outbox = Server.Outbox(sock, on_dead=lambda: None, chat_max=2, game_max=100)
+    outbox.put({'type': 'state', 'n': 0})
+    time.sleep(0.05)                # Schreib-Thread hängt jetzt in sendall
+    for i in range(5):
+        assert outbox.put({'type': 'chat_batch', 'n': i}, chat=True)
+    start = time.monotonic()
+    assert outbox.put({'type': 'state', 'n': 1})
+    assert time.monotonic() - start < 0.1
+    assert outbox.dropped_chat == 3
+
+    sock.release.set()
+    deadline = time.monotonic() + 2
+    while len(sock.sent) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Spiel-Frames zuerst, dann der übrig gebliebene Chat
+    assert [(f['type'], f['n']) for f in sock.sent] == \
+        [('state', 0), ('state', 1), ('chat_batch', 0), ('chat_batch', 1)]
+    outbox.close()
+
+def test_outbox_gives_up_on_client_that_stopped_reading():
+    sock = StuckSocket()
+    outbox = Server.Outbox(sock, on_dead=lambda: None, game_max=2)
+    outbox.put({'type': 'state'})
+    time.sleep(0.05)
+    assert outbox.put({'type': 'state'})
+    assert outbox.put({'type': 'state'})
+    assert not outbox.put({'type': 'state'})
+    sock.release.set()
+
+# --- Diagnose ------------------------------------------------------------------
+
+def test_parse_threshold_rejects_non_finite_and_negative():
+    assert Server.parse_threshold('0') == 0.0
+    assert Server.parse_threshold(12.5) == 12.5
+    for bad in ('nan', 'inf', '-inf', -1, 'abc'):
+        with pytest.raises(ValueError):
+            Server.parse_threshold(bad)
+
+def test_admin_slow_threshold_keeps_old_value_on_bad_input(make_server):
+    srv = make_server(admin_token='geheim', slow_action_ms=50)
+    sent = Recorder()
+    srv.safe_send = sent
+    srv.handle_admin(None, {'type': 'admin', 'token': 'geheim', 'cmd': 'slow_threshold', 'ms': 'nan'})
+    assert srv.slow_action_ms == 50 and sent.frames[-1][1]['type'] == 'error'
+    srv.handle_admin(None, {'type': 'admin', 'token': 'geheim', 'cmd': 'slow_threshold', 'ms': 5})
+    assert srv.slow_action_ms == 5.0 and sent.frames[-1][1] == {'type': 'admin', 'cmd': 'slow_threshold', 'ms': 5.0}
+
+def test_lock_wait_in_broadcast_is_not_counted_as_broadcast(make_server):
+    srv = make_server()
+    held = threading.Event()
+
+    def hold_lock():
+        with srv.lock:
+            held.set()
+            time.sleep(0.1)
+
+    threading.Thread(target=hold_lock).start()
+    held.wait()
+    srv.tracing.phases = {}
+    srv.emit(None, [{'type': 'state'}])
+    phases = srv.tracing.phases
+    assert phases['lock_wait'] >= 0.08
+    assert phases['broadcast'] < 0.05